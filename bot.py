@@ -1,4 +1,4 @@
-import os, math, requests
+import os, math
 import io
 import matplotlib.pyplot as plt
 from datetime import datetime
@@ -12,6 +12,7 @@ from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram import BaseMiddleware
 from aiogram.types import BufferedInputFile
 import asyncio
+from upstream import Upstream
 
 load_dotenv()
 bot_token = os.getenv('bot_token')
@@ -95,12 +96,19 @@ def workout_extra_water_ml(minutes: int) -> int:
     # +200 мл за каждые 30 минут
     return 200 * (minutes // 30)
 
+# Базовые адреса можно переопределить через .env — например, чтобы направить бота
+# на локальный stub-сервер, который отвечает с задержками и ошибками.
+openweather_url = os.getenv('openweather_url', "https://api.openweathermap.org/data/2.5/weather")
+openfoodfacts_url = os.getenv('openfoodfacts_url', "https://world.openfoodfacts.org/cgi/search.pl")
+
+weather_api = Upstream("openweather")
+food_api = Upstream("openfoodfacts")
+
 def get_temperature_c(city: str) -> float | None:
     """
     Возвращает температуру в градусах Цельсия для указанного города.
-    Если не получилось — возвращает None.
+    Если не получилось — возвращает None (или последнее известное значение, если API недоступен).
     """
-    url = "https://api.openweathermap.org/data/2.5/weather"
     params = {
         "q": city,
         "appid": openweather_api_key,
@@ -108,14 +116,10 @@ def get_temperature_c(city: str) -> float | None:
         "lang": "ru",
     }
 
-    try:
-        r = requests.get(url, params=params, timeout=10)
-        if r.status_code != 200:
-            return None
-        data = r.json()
+    def parse(data: dict) -> float:
         return float(data["main"]["temp"])
-    except Exception:
-        return None
+
+    return weather_api.call(city.lower(), openweather_url, params, parse)
 
 def get_food_kcal_per_100g(query: str) -> tuple[str, float] | None:
     """
@@ -123,7 +127,6 @@ def get_food_kcal_per_100g(query: str) -> tuple[str, float] | None:
     Берём первый продукт, где есть kcal на 100г.
     Если не нашли — None.
     """
-    url = "https://world.openfoodfacts.org/cgi/search.pl"
     params = {
         "search_terms": query,
         "search_simple": 1,
@@ -132,15 +135,15 @@ def get_food_kcal_per_100g(query: str) -> tuple[str, float] | None:
         "page_size": 10,
     }
 
-    try:
-        r = requests.get(url, params=params, timeout=10)
-        if r.status_code != 200:
+    def parse(data: dict) -> tuple[str, float] | None:
+        if not isinstance(data, dict):
             return None
-        data = r.json()
-        products = data.get("products", [])
+        products = data.get("products") or []
 
         for p in products:
-            nutr = p.get("nutriments", {})
+            if not isinstance(p, dict):
+                continue
+            nutr = p.get("nutriments") or {}
 
             # 1) Если есть kcal/100g напрямую
             kcal = nutr.get("energy-kcal_100g")
@@ -156,8 +159,8 @@ def get_food_kcal_per_100g(query: str) -> tuple[str, float] | None:
                 return (name, kcal_from_kj)
 
         return None
-    except Exception:
-        return None
+
+    return food_api.call(query.lower(), openfoodfacts_url, params, parse)
 
 class ProfileForm(StatesGroup):
     weight = State()
@@ -289,7 +292,8 @@ async def save_profile_and_reply(message: Message, state: FSMContext, manual_goa
     activity = int(data["activity"])
     city = str(data["city"])
 
-    temp = get_temperature_c(city)  # может вернуть None
+    # в отдельном потоке, чтобы медленный API не блокировал остальных пользователей
+    temp = await asyncio.to_thread(get_temperature_c, city)  # может вернуть None
 
     water_goal = calc_water_goal(weight, activity, temp)
     calorie_goal = calc_calorie_goal(weight, height, age, activity, manual_goal=manual_goal)
@@ -429,7 +433,7 @@ async def cmd_log_food(message: Message, state: FSMContext):
         return
 
     query = parts[1].strip()
-    info = get_food_kcal_per_100g(query)
+    info = await asyncio.to_thread(get_food_kcal_per_100g, query)
 
     if not info:
         await message.answer("Не удалось найти продукт. Попробуй другое название (например на английском).")
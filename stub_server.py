@@ -0,0 +1,97 @@
+"""
+Локальный HTTP-сервер, который притворяется OpenWeather / OpenFoodFacts
+и умеет ломаться: отвечать с задержкой, кодами 5xx/4xx и медленно отдавать тело.
+
+Запуск для ручной проверки бота:
+    python stub_server.py --port 8081 --status 503
+и в .env:
+    openweather_url=http://127.0.0.1:8081/
+    openfoodfacts_url=http://127.0.0.1:8081/
+"""
+import argparse, json, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# один ответ, который годится и для погоды, и для поиска еды
+default_body = {
+    "main": {"temp": 20.0},
+    "products": [{"product_name": "stub", "nutriments": {"energy-kcal_100g": 100}}],
+}
+
+class FaultStub:
+    def __init__(self, port: int = 0):
+        self.status = 200
+        self.statuses = []   # если не пусто — коды для следующих запросов по очереди, потом self.status
+        self.delay_s = 0.0   # пауза перед заголовками ответа
+        self.drip_s = 0.0    # пауза между байтами тела (медленная отдача)
+        self.body = default_body
+        self.hits = 0
+        self.lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with stub.lock:
+                    stub.hits += 1
+                    status = stub.statuses.pop(0) if stub.statuses else stub.status
+                    delay_s, drip_s, body = stub.delay_s, stub.drip_s, stub.body
+                payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+
+                try:
+                    if delay_s:
+                        time.sleep(delay_s)
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    if drip_s:
+                        for i in range(len(payload)):
+                            self.wfile.write(payload[i:i + 1])
+                            self.wfile.flush()
+                            time.sleep(drip_s)
+                    else:
+                        self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    # клиент ушёл по таймауту — это ожидаемо
+                    pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}/"
+
+    def start(self) -> "FaultStub":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Stub-сервер с внедрением сбоев для внешних API бота")
+    ap.add_argument("--port", type=int, default=8081)
+    ap.add_argument("--status", type=int, default=200)
+    ap.add_argument("--delay", type=float, default=0.0, help="пауза перед ответом, сек")
+    ap.add_argument("--drip", type=float, default=0.0, help="пауза между байтами тела, сек")
+    args = ap.parse_args()
+
+    stub = FaultStub(args.port)
+    stub.status, stub.delay_s, stub.drip_s = args.status, args.delay, args.drip
+    print(f"Stub слушает {stub.url} (status={stub.status}, delay={stub.delay_s}s, drip={stub.drip_s}s)")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
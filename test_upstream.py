@@ -0,0 +1,131 @@
+import threading, time
+import pytest
+
+from stub_server import FaultStub
+from upstream import Upstream
+
+def parse_temp(data: dict) -> float:
+    return float(data["main"]["temp"])
+
+@pytest.fixture
+def stub():
+    with FaultStub() as s:
+        yield s
+
+def make_api(**kw) -> Upstream:
+    opts = dict(deadline_s=1.0, attempt_timeout_s=0.3, connect_timeout_s=0.2,
+                max_attempts=3, backoff_s=0.01, fail_threshold=3, open_s=60.0)
+    opts.update(kw)
+    return Upstream("test", **opts)
+
+def test_ok_result_is_cached(stub):
+    api = make_api()
+    assert api.call("moscow", stub.url, {}, parse_temp) == 20.0
+    assert api.cache == {"moscow": 20.0}
+    assert api.health()["state"] == "closed"
+
+def test_retries_5xx_then_succeeds(stub):
+    stub.statuses = [500, 503]
+    api = make_api()
+    assert api.call("moscow", stub.url, {}, parse_temp) == 20.0
+    assert stub.hits == 3
+    assert api.health()["fails"] == 0
+
+def test_404_is_not_found_not_failure(stub):
+    stub.status = 404
+    api = make_api()
+    assert api.call("nowhere", stub.url, {}, parse_temp) is None
+    assert stub.hits == 1
+    assert api.health() == {"state": "closed", "fails": 0, "cached": 0}
+
+def test_401_is_failure_without_retries(stub):
+    api = make_api()
+    api.call("moscow", stub.url, {}, parse_temp)
+    stub.status = 401
+    assert api.call("moscow", stub.url, {}, parse_temp) == 20.0  # stale
+    assert stub.hits == 2
+    assert api.health()["fails"] == 1
+
+def test_deadline_caps_slow_upstream(stub):
+    stub.delay_s = 2.0
+    api = make_api(deadline_s=0.5, attempt_timeout_s=0.3)
+    t = time.monotonic()
+    assert api.call("moscow", stub.url, {}, parse_temp) is None
+    assert time.monotonic() - t < 1.0
+
+def test_slow_body_is_cut_by_attempt_budget(stub):
+    stub.drip_s = 0.05  # ~100 байт тела -> ~5 секунд
+    api = make_api(deadline_s=0.6, attempt_timeout_s=0.3, max_attempts=1)
+    t = time.monotonic()
+    assert api.call("moscow", stub.url, {}, parse_temp) is None
+    assert time.monotonic() - t < 1.0
+    assert api.health()["fails"] == 1
+
+def test_read_timeout_mid_body_is_retried(stub):
+    stub.drip_s = 0.5  # пауза между байтами больше таймаута чтения
+    api = make_api(deadline_s=1.0, attempt_timeout_s=0.2, max_attempts=2)
+    assert api.call("moscow", stub.url, {}, parse_temp) is None
+    assert stub.hits == 2
+    assert api.health()["fails"] == 1
+
+def test_serves_stale_on_error(stub):
+    api = make_api()
+    assert api.call("moscow", stub.url, {}, parse_temp) == 20.0
+    stub.status = 500
+    assert api.call("moscow", stub.url, {}, parse_temp) == 20.0
+    assert api.call("berlin", stub.url, {}, parse_temp) is None
+
+def test_breaker_opens_and_fails_fast(stub):
+    stub.status = 500
+    api = make_api(max_attempts=1)
+    for _ in range(3):
+        api.call("moscow", stub.url, {}, parse_temp)
+    assert api.health()["state"] == "open"
+    hits = stub.hits
+    t = time.monotonic()
+    assert api.call("moscow", stub.url, {}, parse_temp) is None
+    assert time.monotonic() - t < 0.05
+    assert stub.hits == hits
+
+def test_half_open_lets_single_probe_through(stub):
+    stub.status = 500
+    api = make_api(max_attempts=3, fail_threshold=1, open_s=0.0)
+    api.call("moscow", stub.url, {}, parse_temp)
+    assert api.health()["state"] == "open"
+
+    stub.hits = 0
+    stub.delay_s = 0.2  # пока идёт проба, остальные вызовы должны отказывать сразу
+    threads = [threading.Thread(target=api.call, args=("moscow", stub.url, {}, parse_temp)) for _ in range(5)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+
+    assert stub.hits == 1  # одна проба, без ретраев
+    assert api.health()["state"] == "open"
+    assert not api.probe_in_flight
+
+def test_half_open_probe_success_closes(stub):
+    stub.status = 500
+    api = make_api(max_attempts=1, fail_threshold=1, open_s=0.0)
+    api.call("moscow", stub.url, {}, parse_temp)
+    stub.status = 200
+    assert api.call("moscow", stub.url, {}, parse_temp) == 20.0
+    assert api.health()["state"] == "closed"
+
+@pytest.mark.parametrize("body", [[], {"products": None}, {"products": [{"nutriments": None}]}, b"[]"])
+def test_bad_payload_is_miss_not_outage(stub, body):
+    def parse_food(data):
+        for p in data.get("products"):
+            return p.get("nutriments").get("energy-kcal_100g")
+
+    stub.body = body
+    api = make_api(fail_threshold=1)
+    assert api.call("banana", stub.url, {}, parse_food) is None
+    assert api.health() == {"state": "closed", "fails": 0, "cached": 0}
+
+def test_cache_is_bounded(stub):
+    api = make_api(cache_max_items=2)
+    for city in ("a", "b", "c"):
+        api.call(city, stub.url, {}, parse_temp)
+    assert list(api.cache) == ["b", "c"]
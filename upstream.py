@@ -0,0 +1,200 @@
+import json, threading, time
+import requests, urllib3
+
+class UpstreamError(Exception):
+    pass
+
+class Upstream:
+    """
+    Обёртка над одним внешним API (OpenWeather, OpenFoodFacts):
+    дедлайн на запрос пользователя, ретраи с бэкоффом, предохранитель
+    (circuit breaker) и отдача последнего удачного ответа, если апстрим лежит.
+
+    Вызывается из нескольких потоков (asyncio.to_thread), поэтому состояние
+    предохранителя и кэш меняются только под self.lock.
+    """
+
+    def __init__(self, name: str,
+                 deadline_s: float = 4.0,         # общий бюджет на один запрос пользователя (все попытки)
+                 attempt_timeout_s: float = 2.0,  # бюджет одной попытки
+                 connect_timeout_s: float = 1.0,
+                 max_attempts: int = 3,
+                 backoff_s: float = 0.2,          # пауза перед 2-й попыткой, дальше удваивается
+                 fail_threshold: int = 3,         # столько неудач подряд -> цепь размыкается
+                 open_s: float = 30.0,            # сколько секунд сразу отказываем, потом один пробный запрос
+                 cache_max_items: int = 500):
+        self.name = name
+        self.deadline_s = deadline_s
+        self.attempt_timeout_s = attempt_timeout_s
+        self.connect_timeout_s = connect_timeout_s
+        self.max_attempts = max_attempts
+        self.backoff_s = backoff_s
+        self.fail_threshold = fail_threshold
+        self.open_s = open_s
+        self.cache_max_items = cache_max_items
+
+        self.lock = threading.Lock()
+        self.state = "closed"  # closed / open / half_open
+        self.fails = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.cache = {}  # key -> последний удачный результат (dict хранит порядок вставки)
+
+    def log(self, text: str):
+        print(f"[API] {self.name}: {text}")
+
+    def health(self) -> dict:
+        with self.lock:
+            return {"state": self.state, "fails": self.fails, "cached": len(self.cache)}
+
+    # --- предохранитель ---
+
+    def _set_state(self, state: str):
+        # вызывать только под self.lock
+        if self.state != state:
+            self.log(f"circuit {self.state} -> {state} (fails={self.fails})")
+            self.state = state
+        if state == "open":
+            self.opened_at = time.monotonic()
+
+    def _acquire(self) -> str | None:
+        """
+        "normal" — обычный запрос, "probe" — единственный пробный запрос
+        после паузы, None — цепь разомкнута, отказываем сразу.
+        """
+        with self.lock:
+            if self.state == "closed":
+                return "normal"
+            if (self.state == "open" and not self.probe_in_flight
+                    and time.monotonic() - self.opened_at >= self.open_s):
+                self.probe_in_flight = True
+                self._set_state("half_open")
+                return "probe"
+            return None
+
+    def _finish(self, ok: bool, probe: bool):
+        with self.lock:
+            if probe:
+                self.probe_in_flight = False
+            if ok:
+                self.fails = 0
+                self._set_state("closed")
+            else:
+                self.fails += 1
+                if probe or self.fails >= self.fail_threshold:
+                    self._set_state("open")
+
+    # --- кэш ---
+
+    def _cache_get(self, key: str):
+        with self.lock:
+            return self.cache.get(key)
+
+    def _cache_put(self, key: str, value):
+        with self.lock:
+            self.cache.pop(key, None)
+            self.cache[key] = value
+            while len(self.cache) > self.cache_max_items:
+                # выкидываем самую старую запись
+                self.cache.pop(next(iter(self.cache)), None)
+
+    # --- HTTP ---
+
+    def _get_once(self, url: str, params: dict, attempt_end: float) -> tuple[int, object]:
+        """
+        Одна попытка. Тело читаем кусками и обрываем, если вышли за attempt_end,
+        так что медленно отдающий сервер не растянет попытку. Бюджет всё равно
+        приблизительный: перебор — не больше одного таймаута чтения сокета.
+        """
+        read_timeout = max(attempt_end - time.monotonic(), 0.01)
+        timeout = (min(self.connect_timeout_s, read_timeout), read_timeout)
+        with requests.get(url, params=params, timeout=timeout, stream=True) as r:
+            if r.status_code != 200:
+                return r.status_code, None
+            chunks = []
+            while True:
+                # read1 возвращает то, что уже пришло, а не ждёт весь запрошенный размер
+                chunk = r.raw.read1(65536, decode_content=True)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                if time.monotonic() > attempt_end:
+                    # закрываем сокет, иначе requests при выходе дочитает тело до конца
+                    r.raw.close()
+                    raise requests.Timeout("attempt budget exceeded while reading body")
+            return 200, json.loads(b"".join(chunks))
+
+    def fetch_json(self, url: str, params: dict, deadline: float, max_attempts: int):
+        """
+        GET с ретраями и бэкоффом в пределах дедлайна.
+        Возвращает JSON, None если апстрим ответил 400/404 (например, город не найден),
+        или бросает UpstreamError, если апстрим недоступен или отвергает наш ключ.
+        """
+        delay = self.backoff_s
+        for attempt in range(1, max_attempts + 1):
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            try:
+                status, data = self._get_once(url, params, min(now + self.attempt_timeout_s, deadline))
+                if status == 200:
+                    return data
+                if status in (400, 404):
+                    return None
+                self.log(f"attempt {attempt} status={status}")
+                if status != 429 and status < 500:
+                    # 401/403 и т.п. — ретраи не помогут, но это именно сбой, а не "не найдено"
+                    raise UpstreamError(f"{self.name}: status {status}")
+            except (requests.RequestException, urllib3.exceptions.HTTPError, ValueError) as e:
+                self.log(f"attempt {attempt} error={type(e).__name__}")
+
+            if attempt == max_attempts or deadline - time.monotonic() <= delay:
+                break
+            time.sleep(delay)
+            delay *= 2
+        raise UpstreamError(self.name)
+
+    def call(self, key: str, url: str, params: dict, parse):
+        """
+        Запрос к апстриму с учётом предохранителя. parse(data) превращает JSON
+        в результат; кривой ответ (parse упал) считается "ничего не нашли", а не сбоем.
+        Никогда не бросает: при сбое возвращает последнее удачное значение или None.
+        """
+        mode = self._acquire()
+        if mode is None:
+            stale = self._cache_get(key)
+            self.log(f"circuit open, fail fast (stale={'yes' if stale is not None else 'no'})")
+            return stale
+
+        probe = mode == "probe"
+        ok = False
+        data = None
+        try:
+            # пробный запрос — одна попытка без ретраев
+            data = self.fetch_json(url, params, time.monotonic() + self.deadline_s,
+                                   1 if probe else self.max_attempts)
+            ok = True
+        except UpstreamError:
+            pass
+        except Exception as e:
+            self.log(f"unexpected error={type(e).__name__}")
+        finally:
+            self._finish(ok, probe)
+
+        if not ok:
+            stale = self._cache_get(key)
+            if stale is not None:
+                self.log(f"serving stale value for {key!r}")
+            return stale
+
+        if data is None:
+            return None
+        try:
+            result = parse(data)
+        except Exception as e:
+            self.log(f"unexpected payload for {key!r}: {type(e).__name__}")
+            return None
+
+        if result is not None:
+            self._cache_put(key, result)
+        return result